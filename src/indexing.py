@@ -1,27 +1,65 @@
 # src/indexing.py
 import os
-from typing import List, Optional
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
 from src.embedings import create_embeddings_model
 
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# Nombre del archivo que apunta a la versión publicada de cada índice
+CURRENT_POINTER = "CURRENT"
+# Subdirectorio donde se guardan las versiones de cada índice
+VERSIONS_DIR = "versions"
+# Archivo de bloqueo que serializa la publicación entre procesos
+PUBLISH_LOCK = ".lock"
+# Archivos que escribe FAISS.save_local; en el formato anterior están en index_dir/<nombre>
+LEGACY_INDEX_FILES = ("index.faiss", "index.pkl")
+# Antigüedad (segundos) a partir de la cual un directorio temporal se considera abandonado
+STALE_TMP_SECONDS = 3600
+
+
 class IndexManager:
     """
     Clase para manejar la creación, guardado y carga de índices FAISS.
     
+    Cada índice se guarda como una serie de versiones inmutables en
+    ``index_dir/<nombre>/versions/<version>``. La versión activa se publica
+    reemplazando de forma atómica el archivo ``index_dir/<nombre>/CURRENT``,
+    de modo que un lector nunca ve un índice a medio escribir.
+    
     Attributes:
         index_dir (str): Directorio donde se guardarán los índices
         embeddings_model: Modelo de embeddings a utilizar
+        keep_versions (int): Número de versiones a conservar en disco
     """
     
-    def __init__(self, index_dir: str = "indexes"):
+    def __init__(self, index_dir: str = "indexes", keep_versions: int = 3):
         """
         Inicializa el IndexManager.
         
         Args:
             index_dir: Directorio donde se guardarán los índices
+            keep_versions: Número de versiones a conservar por índice; al menos
+                2, para que un lector que acaba de leer CURRENT pueda cargar
+                la versión anterior aunque otro proceso publique una nueva
+            
+        Raises:
+            ValueError: Si keep_versions es menor que 2
         """
+        if keep_versions < 2:
+            raise ValueError("keep_versions debe ser al menos 2")
+        
         self.index_dir = index_dir
+        self.keep_versions = keep_versions
         self.embeddings_model = create_embeddings_model()
         
         # Crear directorio de índices si no existe
@@ -51,14 +89,26 @@ class IndexManager:
         except Exception as e:
             raise Exception(f"Error al crear el índice: {str(e)}")
     
-    def save_index(self, db: FAISS, index_name: str) -> None:
+    def save_index(self, db: FAISS, index_name: str) -> str:
         """
-        Guarda un índice FAISS en disco.
+        Guarda un índice FAISS en disco como una nueva versión y la publica.
+        
+        El índice se escribe primero en un directorio temporal, se sincroniza
+        con disco, se renombra a su directorio de versión definitivo y, por
+        último, se actualiza el puntero CURRENT de forma atómica. Así, incluso
+        tras un corte de energía, CURRENT nunca apunta a una versión incompleta.
+        
+        La publicación y la limpieza de versiones antiguas se hacen bajo un
+        bloqueo de archivo, y CURRENT solo avanza: si otro proceso ya publicó
+        una versión más reciente, la guardada queda como versión anterior.
         
         Args:
             db: Índice FAISS a guardar
             index_name: Nombre del índice
             
+        Returns:
+            str: Identificador de la versión guardada
+            
         Raises:
             ValueError: Si no se proporciona un índice válido o nombre
         """
@@ -66,18 +116,85 @@ class IndexManager:
             raise ValueError("Se requiere un índice válido y un nombre")
         
         try:
-            index_path = os.path.join(self.index_dir, index_name)
-            db.save_local(index_path)
-            print(f"Índice guardado en: {index_path}")
+            versions_path = os.path.join(self.index_dir, index_name, VERSIONS_DIR)
+            os.makedirs(versions_path, exist_ok=True)
+            
+            version = self._next_version(index_name)
+            tmp_path = os.path.join(versions_path, f".tmp-{version}")
+            version_path = os.path.join(versions_path, version)
+            
+            try:
+                db.save_local(tmp_path)
+                self._fsync_tree(tmp_path)
+                os.rename(tmp_path, version_path)
+                self._fsync_dir(versions_path)
+            except Exception:
+                # No dejar en disco una versión a medio escribir
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            
+            with self._publish_lock(index_name):
+                current = self.get_current_version(index_name)
+                if current is None or version > current:
+                    self._write_pointer(index_name, version)
+                    self._remove_legacy_files(index_name)
+                    print(f"Índice guardado en: {version_path}")
+                else:
+                    print(
+                        f"Índice guardado en: {version_path} "
+                        f"(no publicado: la versión {current} es más reciente)"
+                    )
+                
+                self._prune_versions(index_name)
+            return version
         except Exception as e:
             raise Exception(f"Error al guardar el índice: {str(e)}")
     
-    def load_index(self, index_name: str) -> Optional[FAISS]:
+    def get_current_version(self, index_name: str) -> Optional[str]:
+        """
+        Obtiene la versión publicada de un índice.
+        
+        Args:
+            index_name: Nombre del índice
+            
+        Returns:
+            str: Identificador de la versión actual o None si no hay ninguna
+        """
+        pointer_path = os.path.join(self.index_dir, index_name, CURRENT_POINTER)
+        try:
+            with open(pointer_path, "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+    
+    def list_versions(self, index_name: str) -> List[str]:
+        """
+        Lista las versiones completas de un índice, de la más antigua a la más reciente.
+        
+        Args:
+            index_name: Nombre del índice
+            
+        Returns:
+            List[str]: Identificadores de versión ordenados
+        """
+        versions_path = os.path.join(self.index_dir, index_name, VERSIONS_DIR)
+        if not os.path.isdir(versions_path):
+            return []
+        
+        return sorted(
+            name for name in os.listdir(versions_path)
+            if not name.startswith(".")
+            and os.path.isdir(os.path.join(versions_path, name))
+        )
+    
+    def load_index(self, index_name: str, version: Optional[str] = None) -> Optional[FAISS]:
         """
         Carga un índice FAISS desde disco.
         
         Args:
             index_name: Nombre del índice a cargar
+            version: Versión a cargar; por defecto la publicada en CURRENT
             
         Returns:
             FAISS: Índice cargado o None si no existe
@@ -85,10 +202,11 @@ class IndexManager:
         Raises:
             FileNotFoundError: Si el índice no existe
         """
-        index_path = os.path.join(self.index_dir, index_name)
+        index_path = self._resolve_index_path(index_name, version)
         
-        if not os.path.exists(index_path):
-            raise FileNotFoundError(f"No se encontró el índice: {index_path}")
+        if not index_path or not os.path.exists(index_path):
+            missing = index_path or os.path.join(self.index_dir, index_name)
+            raise FileNotFoundError(f"No se encontró el índice: {missing}")
         
         try:
             print(f"\nCargando índice desde: {index_path}")
@@ -98,6 +216,175 @@ class IndexManager:
         except Exception as e:
             raise Exception(f"Error al cargar el índice: {str(e)}")
     
+    def _resolve_index_path(self, index_name: str, version: Optional[str] = None) -> Optional[str]:
+        """
+        Obtiene la ruta en disco de una versión de un índice.
+        
+        Sin versión ni puntero CURRENT se usa el formato anterior, guardado
+        directamente en ``index_dir/<nombre>``, si existe; si no, la versión
+        completa más reciente (un primer guardado interrumpido antes de
+        escribir CURRENT). Devuelve None si no hay ningún índice.
+        """
+        base_path = os.path.join(self.index_dir, index_name)
+        version = version or self.get_current_version(index_name)
+        if version:
+            return os.path.join(base_path, VERSIONS_DIR, version)
+        
+        if os.path.exists(os.path.join(base_path, LEGACY_INDEX_FILES[0])):
+            return base_path
+        
+        versions = self.list_versions(index_name)
+        if versions:
+            return os.path.join(base_path, VERSIONS_DIR, versions[-1])
+        return None
+    
+    def _next_version(self, index_name: str) -> str:
+        """
+        Genera un identificador de versión que se ordena después de todos los existentes.
+        
+        Se basa en los nanosegundos desde la época Unix (UTC), pero nunca
+        retrocede aunque el reloj del sistema se atrase, para que el orden
+        lexicográfico de las versiones coincida con su orden de publicación.
+        """
+        sequence = time.time_ns()
+        versions = self.list_versions(index_name)
+        if versions:
+            try:
+                sequence = max(sequence, int(versions[-1].split("-", 1)[0]) + 1)
+            except ValueError:
+                pass
+        return f"{sequence:020d}-{uuid.uuid4().hex[:8]}"
+    
+    @contextmanager
+    def _publish_lock(self, index_name: str) -> Iterator[None]:
+        """
+        Bloqueo exclusivo entre procesos para publicar y limpiar versiones de un índice.
+        """
+        lock_path = os.path.join(self.index_dir, index_name, PUBLISH_LOCK)
+        with open(lock_path, "a+b") as f:
+            if os.name == "nt":
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK se rinde tras unos segundos; se vuelve a intentar
+                        continue
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    
+    def _write_pointer(self, index_name: str, version: str) -> None:
+        """
+        Publica una versión reemplazando el puntero CURRENT de forma atómica.
+        """
+        pointer_path = os.path.join(self.index_dir, index_name, CURRENT_POINTER)
+        tmp_path = f"{pointer_path}.tmp-{uuid.uuid4().hex[:8]}"
+        
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, pointer_path)
+        self._fsync_dir(os.path.dirname(pointer_path))
+    
+    @staticmethod
+    def _fsync_dir(path: str) -> None:
+        """
+        Sincroniza con disco las entradas de un directorio (renombrados, creaciones).
+        
+        En Windows no es posible abrir un directorio para sincronizarlo, por lo
+        que la operación se omite.
+        """
+        if os.name == "nt":
+            return
+        
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _fsync_tree(self, path: str) -> None:
+        """
+        Sincroniza con disco todos los archivos y directorios bajo una ruta.
+        """
+        for root, _, files in os.walk(path):
+            for name in files:
+                # En Windows os.fsync requiere acceso de escritura
+                with open(os.path.join(root, name), "r+b") as f:
+                    os.fsync(f.fileno())
+            self._fsync_dir(root)
+    
+    def _prune_versions(self, index_name: str) -> None:
+        """
+        Elimina las versiones más antiguas que la publicada, conservando
+        keep_versions en total. Debe llamarse con el bloqueo de publicación.
+        
+        También elimina los directorios de versión y punteros CURRENT
+        temporales abandonados por guardados interrumpidos.
+        """
+        base_path = os.path.join(self.index_dir, index_name)
+        versions_path = os.path.join(base_path, VERSIONS_DIR)
+        self._remove_stale_tmp(versions_path, ".tmp-")
+        self._remove_stale_tmp(base_path, f"{CURRENT_POINTER}.tmp-")
+        
+        current = self.get_current_version(index_name)
+        # Las versiones posteriores a CURRENT son de otro proceso que aún no
+        # ha publicado su puntero, así que nunca se eliminan
+        versions = [
+            v for v in self.list_versions(index_name)
+            if current and v < current
+        ]
+        stale = versions[:max(0, len(versions) - (self.keep_versions - 1))]
+        
+        for version in stale:
+            shutil.rmtree(os.path.join(versions_path, version), ignore_errors=True)
+    
+    def _remove_legacy_files(self, index_name: str) -> None:
+        """
+        Elimina los archivos del formato anterior una vez publicado CURRENT,
+        ya que a partir de entonces no se vuelven a leer.
+        """
+        base_path = os.path.join(self.index_dir, index_name)
+        for name in LEGACY_INDEX_FILES:
+            try:
+                os.remove(os.path.join(base_path, name))
+            except FileNotFoundError:
+                continue
+    
+    @staticmethod
+    def _remove_stale_tmp(path: str, prefix: str) -> None:
+        """
+        Elimina las entradas temporales con el prefijo dado que estén abandonadas.
+        
+        Las recientes se conservan porque pueden pertenecer a otro proceso que
+        está guardando en este momento.
+        """
+        for name in os.listdir(path):
+            if not name.startswith(prefix):
+                continue
+            
+            tmp_path = os.path.join(path, name)
+            try:
+                if time.time() - os.path.getmtime(tmp_path) <= STALE_TMP_SECONDS:
+                    continue
+                if os.path.isdir(tmp_path):
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                else:
+                    os.remove(tmp_path)
+            except OSError:
+                continue
+    
     def similarity_search(
         self,
         db: FAISS,
@@ -128,6 +415,181 @@ class IndexManager:
             raise Exception(f"Error en la búsqueda: {str(e)}")
 
 
+class _IndexVersion:
+    """
+    Versión de un índice cargada en memoria junto con sus consultas en curso.
+    """
+    
+    def __init__(self, db: FAISS, version: Optional[str]):
+        self.db = db
+        self.version = version
+        self.refs = 0
+        self.retired = False
+
+
+class LiveIndex:
+    """
+    Índice FAISS que se recarga en segundo plano cuando se publica una nueva versión.
+    
+    Un hilo en segundo plano vigila el puntero CURRENT y carga la nueva
+    versión fuera del camino de las consultas. El cambio de versión es un
+    simple intercambio de referencia, por lo que las consultas no se
+    detienen; la versión anterior se libera cuando terminan las consultas
+    que aún la están usando.
+    
+    Attributes:
+        index_manager (IndexManager): Gestor usado para cargar las versiones
+        index_name (str): Nombre del índice a servir
+        poll_interval (float): Segundos entre comprobaciones del puntero CURRENT
+    """
+    
+    def __init__(
+        self,
+        index_manager: IndexManager,
+        index_name: str,
+        poll_interval: float = 5.0
+    ):
+        """
+        Inicializa el LiveIndex cargando la versión publicada actualmente.
+        
+        Args:
+            index_manager: Gestor de índices a utilizar
+            index_name: Nombre del índice a servir
+            poll_interval: Segundos entre comprobaciones de nuevas versiones
+            
+        Raises:
+            FileNotFoundError: Si el índice no existe
+        """
+        self.index_manager = index_manager
+        self.index_name = index_name
+        self.poll_interval = poll_interval
+        
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Última versión publicada que no se pudo cargar; no se reintenta hasta que cambie CURRENT
+        self._failed_version: Optional[str] = None
+        
+        version = index_manager.get_current_version(index_name)
+        self._current = _IndexVersion(index_manager.load_index(index_name, version), version)
+    
+    @property
+    def version(self) -> Optional[str]:
+        """Versión que atienden actualmente las nuevas consultas."""
+        return self._current.version
+    
+    def start(self) -> None:
+        """
+        Inicia el hilo que vigila y recarga nuevas versiones del índice.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._watch,
+            name=f"LiveIndex-{self.index_name}",
+            daemon=True
+        )
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """
+        Detiene el hilo de recarga y espera a que termine.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def reload(self) -> bool:
+        """
+        Carga la versión publicada si es distinta de la actual y la activa.
+        
+        Si la versión publicada no se puede cargar, no se vuelve a intentar
+        hasta que se publique otra.
+        
+        Returns:
+            bool: True si se cambió a una nueva versión
+        """
+        with self._reload_lock:
+            version = self.index_manager.get_current_version(self.index_name)
+            if not version or version in (self._current.version, self._failed_version):
+                return False
+            
+            # La carga se hace fuera de self._lock para no bloquear consultas
+            try:
+                db = self.index_manager.load_index(self.index_name, version)
+            except Exception:
+                self._failed_version = version
+                raise
+            new_version = _IndexVersion(db, version)
+            self._failed_version = None
+            
+            with self._lock:
+                old_version = self._current
+                self._current = new_version
+                old_version.retired = True
+                self._release_if_drained(old_version)
+            
+            print(f"Índice '{self.index_name}' actualizado a la versión {version}")
+            return True
+    
+    @contextmanager
+    def acquire(self) -> Iterator[FAISS]:
+        """
+        Reserva la versión actual del índice durante una consulta.
+        
+        Yields:
+            FAISS: Índice que permanece válido hasta salir del bloque
+        """
+        with self._lock:
+            entry = self._current
+            entry.refs += 1
+        try:
+            yield entry.db
+        finally:
+            with self._lock:
+                entry.refs -= 1
+                self._release_if_drained(entry)
+    
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        """
+        Realiza una búsqueda de similitud sobre la versión actual del índice.
+        
+        Args:
+            query: Texto de consulta
+            k: Número de resultados a retornar
+            
+        Returns:
+            List[Document]: Lista de documentos similares
+        """
+        with self.acquire() as db:
+            return self.index_manager.similarity_search(db, query, k=k)
+    
+    def _watch(self) -> None:
+        """
+        Bucle del hilo en segundo plano que comprueba nuevas versiones.
+        """
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error al recargar el índice '{self.index_name}': {str(e)}")
+    
+    @staticmethod
+    def _release_if_drained(entry: _IndexVersion) -> None:
+        """
+        Libera una versión retirada cuando ya no tiene consultas en curso.
+        
+        Debe llamarse con self._lock adquirido.
+        """
+        if entry.retired and entry.refs == 0 and entry.db is not None:
+            entry.db = None
+            print(f"Versión {entry.version} del índice liberada")
+
+
 if __name__ == '__main__':
     # Ejemplo de uso
     from src.document_loader import load_documents_from_dir
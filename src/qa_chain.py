@@ -5,8 +5,8 @@ import google.generativeai as genai
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain.llms import GoogleGenerativeAI
-from src.indexer import search_index  # Importa la función search_index
-from src.embeddings import create_embeddings_model # Importa la funcion de embeddings
+from langchain_community.vectorstores import FAISS
+from src.indexing import IndexManager, LiveIndex
 
 load_dotenv()
 google_api_key = os.getenv("GOOGLE_API_KEY")
@@ -36,19 +36,22 @@ def generate_answer(query, db, k=4):
     Genera una respuesta a una pregunta utilizando Gemini, buscando primero en el índice FAISS.
     Args:
         query: La pregunta a responder.
-        db: El índice FAISS.
+        db: El índice FAISS o un LiveIndex; con un LiveIndex la búsqueda usa
+            la versión publicada más reciente sin detener las consultas.
         k: Número de documentos a recuperar del índice.
     Returns:
         La respuesta generada por Gemini.
     """
-    docs = search_index(db, query, k=k)
+    if not isinstance(db, (FAISS, LiveIndex)):
+        raise ValueError("Se requiere un índice FAISS o un LiveIndex")
+    docs = db.similarity_search(query, k=k)
     context = "\n".join([doc.page_content for doc in docs])
     response = llm_chain.run(context=context, question=query)
     return response
 
 if __name__ == '__main__':
     # Ejemplo de uso (necesitas cargar documentos, fragmentarlos y crear el índice primero)
-    from src import document_loader, text_splitter, indexer
+    from src import document_loader, text_splitter
 
     # Cargar documentos
     documents = document_loader.load_documents_from_dir("data/documents")
@@ -57,14 +60,21 @@ if __name__ == '__main__':
         exit()
 
     # Fragmentar el texto
-    fragments = text_splitter.split_text(documents)
+    fragments = text_splitter.split_documents(documents)
 
-    # Crear el índice
-    embeddings = create_embeddings_model()
-    db = indexer.create_index(fragments, embeddings)
+    # Crear y publicar el índice
+    index_manager = IndexManager()
+    db = index_manager.create_index(fragments)
+    index_manager.save_index(db, "documentos_index")
+
+    # Servir el índice publicado, recargando nuevas versiones en segundo plano
+    live_index = LiveIndex(index_manager, "documentos_index")
+    live_index.start()
 
     # Realizar una pregunta
     pregunta = "¿De qué trata este documento?"
-    respuesta = generate_answer(pregunta, db)
+    respuesta = generate_answer(pregunta, live_index)
     print(f"Pregunta: {pregunta}")
-    print(f"Respuesta: {respuesta}")
\ No newline at end of file
+    print(f"Respuesta: {respuesta}")
+
+    live_index.stop()